@@ -2,9 +2,13 @@
 
 import os
 import shutil
-from tqdm import tqdm
+
+SOURCE_PATH = "/mnt/c/Users/tadej/Documents/Projects/free/productivity/obsidian"
+DESTINATION_PATH = "/mnt/c/Users/tadej/OneDrive/Documents/obsidian"
 
 def copy_files_with_progress(src, dst):
+    from tqdm import tqdm
+
     total_files = sum([len(files) for r, d, files in os.walk(src)])
     with tqdm(total=total_files, unit='file', desc='Copying files') as pbar:
         for root, dirs, files in os.walk(src):
@@ -27,21 +31,21 @@ def copy_files_with_progress(src, dst):
                 shutil.copy2(src_file, dest_file)
                 pbar.update(1)
 
-# Define the source and destination paths
-source_path = "/mnt/c/Users/tadej/Documents/Projects/free/productivity/obsidian"
-destination_path = "/mnt/c/Users/tadej/OneDrive/Documents/obsidian"
-
-# Check if the source directory exists
-if not os.path.exists(source_path):
-    print(f"The source directory {source_path} does not exist.")
-else:
-    # Create the destination directory if it does not exist
-    if not os.path.exists(destination_path):
-        os.makedirs(destination_path)
-
-    # Copy the source directory to the destination directory with progress
-    try:
-        copy_files_with_progress(source_path, destination_path)
-        print(f"Copied {source_path} to {destination_path} successfully.")
-    except Exception as e:
-        print(f"Error: {e}")
\ No newline at end of file
+def main(src=SOURCE_PATH, dst=DESTINATION_PATH):
+    # Check if the source directory exists
+    if not os.path.exists(src):
+        print(f"The source directory {src} does not exist.")
+    else:
+        # Create the destination directory if it does not exist
+        if not os.path.exists(dst):
+            os.makedirs(dst)
+
+        # Copy the source directory to the destination directory with progress
+        try:
+            copy_files_with_progress(src, dst)
+            print(f"Copied {src} to {dst} successfully.")
+        except Exception as e:
+            print(f"Error: {e}")
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,9 @@
 import os
 import shutil
 
+SOURCE_PATH = "/mnt/c/users/tadej/Documents"
+DESTINATION_PATH = "/mnt/c/Users/tadej/OneDrive - Univerza v Ljubljani/Documents"
+
 def copy_files_with_progress(src, dst):
     total_files = sum([len(files) for r, d, files in os.walk(src)])
     for root, dirs, files in os.walk(src):
@@ -38,28 +41,28 @@ def delete_extra_files(src, dst):
                 shutil.rmtree(dst_dir)
                 print(f"Deleted directory: {dst_dir}")
 
-# Define the source and destination paths
-source_path = "/mnt/c/users/tadej/Documents"
-destination_path = "/mnt/c/Users/tadej/OneDrive - Univerza v Ljubljani/Documents"
+def main(src=SOURCE_PATH, dst=DESTINATION_PATH):
+    # Check if the source directory exists
+    if not os.path.exists(src):
+        print(f"The source directory {src} does not exist.")
+    else:
+        # Create the destination directory if it does not exist
+        if not os.path.exists(dst):
+            os.makedirs(dst)
 
-# Check if the source directory exists
-if not os.path.exists(source_path):
-    print(f"The source directory {source_path} does not exist.")
-else:
-    # Create the destination directory if it does not exist
-    if not os.path.exists(destination_path):
-        os.makedirs(destination_path)
+        # Delete extra files in the destination directory
+        try:
+            delete_extra_files(src, dst)
+            print(f"Deleted extra files in {dst} successfully.")
+        except Exception as e:
+            print(f"Error while deleting extra files: {e}")
 
-    # Delete extra files in the destination directory
-    try:
-        delete_extra_files(source_path, destination_path)
-        print(f"Deleted extra files in {destination_path} successfully.")
-    except Exception as e:
-        print(f"Error while deleting extra files: {e}")
+        # Copy the source directory to the destination directory with progress
+        try:
+            copy_files_with_progress(src, dst)
+            print(f"Copied {src} to {dst} successfully.")
+        except Exception as e:
+            print(f"Error while copying files: {e}")
 
-    # Copy the source directory to the destination directory with progress
-    try:
-        copy_files_with_progress(source_path, destination_path)
-        print(f"Copied {source_path} to {destination_path} successfully.")
-    except Exception as e:
-        print(f"Error while copying files: {e}")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+
+import argparse
+import random
+import time
+
+from matching import MatchIndex, normalize
+
+def make_words(count, rng):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [''.join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(count)]
+
+def make_descriptions(count, seed):
+    rng = random.Random(seed)
+    words = make_words(5000, rng)
+    return [' '.join(rng.choice(words) for _ in range(rng.randint(3, 7))) for _ in range(count)]
+
+def as_todo_txt(description, rng):
+    """Decorate a description the way todo.txt lines look."""
+    return f"({rng.choice('ABC')}) 2024-01-{rng.randint(10, 28)} {description} +work @home due:2024-02-01"
+
+def near_duplicate(description, rng):
+    """Drop or duplicate a character, the kind of edit that makes raw equality miss."""
+    i = rng.randrange(len(description))
+    return description[:i] + description[i + 1:] if rng.random() < 0.5 else description[:i] + description[i] + description[i:]
+
+def make_distinct_variants(count, seed):
+    """Pairs of different tasks that differ in one number, date or word, the cases a near-duplicate check must not merge."""
+    rng = random.Random(seed)
+    words = make_words(500, rng)
+    pairs = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            week = rng.randint(2, 52)
+            pairs.append((f'Week {week} report', f'Week {week - 1} report'))
+        elif kind == 1:
+            bug = rng.randint(1000, 9999)
+            pairs.append((f'Fix bug {bug}', f'Fix bug {bug + 1}'))
+        elif kind == 2:
+            invoice = rng.randint(2, 999)
+            pairs.append((f'Invoice 2024-{invoice:03}', f'Invoice 2024-{invoice - 1:03}'))
+        else:
+            phrase = [rng.choice(words) for _ in range(rng.randint(3, 6))]
+            changed = list(phrase)
+            changed[rng.randrange(len(changed))] = rng.choice(words)
+            pairs.append((' '.join(phrase), ' '.join(changed)))
+    return [(a, b) for a, b in pairs if a != b]
+
+def timed(label, func):
+    start = time.perf_counter()
+    value = func()
+    print(f"{label:40} {(time.perf_counter() - start) * 1000:10.1f} ms")
+    return value
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark description matching across sources')
+    parser.add_argument('-n', '--tasks', type=int, default=50000, help='tasks per source')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    base = make_descriptions(args.tasks, seed=1)
+    todo_txt = [as_todo_txt(description, rng) for description in base]
+    taskwarrior = [description.upper() for description in base]
+    # A tenth of the Todoist tasks are slightly edited copies
+    todoist = [near_duplicate(description, rng) if i % 10 == 0 else description for i, description in enumerate(base)]
+
+    print(f"{args.tasks} tasks per source")
+    timed('normalize todo.txt lines', lambda: [normalize(line) for line in todo_txt])
+
+    index = MatchIndex()
+    timed('index taskwarrior', lambda: [index.add(description) for description in taskwarrior])
+
+    exact = timed('exact lookups (todo.txt)', lambda: sum(1 for line in todo_txt if line in index))
+    print(f"  {exact} / {len(todo_txt)} exact matches")
+
+    missing = timed('exact lookups (todoist)', lambda: [description for description in todoist if description not in index])
+    timed('build near-duplicate signatures', index.build_signatures)
+    flagged = timed('near-duplicate lookups (todoist misses)', lambda: sum(1 for description in missing if index.near_duplicates(description)))
+    print(f"  {flagged} / {len(missing)} misses flagged as likely duplicates")
+
+    unrelated = make_descriptions(len(missing), seed=2)
+    false_positives = timed('near-duplicate lookups (unrelated)', lambda: sum(1 for description in unrelated if index.near_duplicates(description)))
+    print(f"  {false_positives} / {len(unrelated)} unrelated tasks flagged")
+
+    # Distinct tasks that differ in one number, date or word; each pair gets its own index
+    variants = make_distinct_variants(2000, seed=3)
+    def count_flagged_variants():
+        flagged = 0
+        for original, variant in variants:
+            pair_index = MatchIndex()
+            pair_index.add(original)
+            flagged += bool(pair_index.near_duplicates(variant))
+        return flagged
+    flagged_variants = timed('near-duplicate lookups (distinct variants)', count_flagged_variants)
+    print(f"  {flagged_variants} / {len(variants)} distinct numbered/dated/one-word-different tasks flagged (warned about, still added)")
+    exact_variants = sum(1 for original, variant in variants if normalize(original) == normalize(variant))
+    print(f"  {exact_variants} / {len(variants)} treated as the same task (must be 0)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+
+import os
+import subprocess
+import sys
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ENTRY_POINTS = [
+    'sync_all_three',
+    'sync_todoist_taskwarrior',
+    'sync_profiles',
+    'convert.todo_to_taskwarrior',
+    'convert.taskwarrior_to_todo',
+    'backup.backup_obsidian',
+    'backup.backup_to_drive',
+]
+
+# Modules that must stay out of the import path of every entry point.
+HEAVY_MODULES = {'requests', 'pytz', 'dateutil', 'dotenv', 'tqdm'}
+
+# Cold start budget for the no-op path (`--help`), in milliseconds.
+NOOP_TARGET_MS = 150
+
+def import_time(module):
+    """Return (cumulative import time in us, imported module names) for module."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=SCRIPTS_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    cumulative = 0
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        imported.add(name.split('.')[0])
+        if name == module:
+            cumulative = int(cumulative_us)
+    return cumulative, imported
+
+def noop_time(script, runs=5):
+    """Best-of-N wall time in ms for running script with --help."""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script, '--help'], cwd=SCRIPTS_DIR, capture_output=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    failed = False
+    for module in ENTRY_POINTS:
+        cumulative, imported = import_time(module)
+        heavy = sorted(HEAVY_MODULES & imported)
+        print(f"{module:32} {cumulative / 1000:8.2f} ms" + (f"  heavy: {', '.join(heavy)}" if heavy else ''))
+        failed = failed or bool(heavy)
+
+    elapsed = noop_time(os.path.join('convert', 'taskwarrior_to_todo.py'))
+    print(f"{'no-op (--help)':32} {elapsed:8.2f} ms  target {NOOP_TARGET_MS} ms")
+    failed = failed or elapsed > NOOP_TARGET_MS
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/python3
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+import uuid as uuidlib
+
+import taskwarrior_store
+
+STATUSES = ('pending', 'pending', 'pending', 'completed', 'deleted')
+PROJECTS = ('', 'home', 'work', 'work.reports')
+
+def export_date(epoch):
+    return time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(epoch))
+
+def make_fixture(count, seed=0):
+    """Return [(uuid, raw legacy attributes, raw taskchampion attributes, expected export record)]."""
+    rng = random.Random(seed)
+    tasks = []
+    pending_id = 0
+    for i in range(count):
+        uuid = str(uuidlib.UUID(int=rng.getrandbits(128)))
+        status = rng.choice(STATUSES)
+        entry = 1700000000 + i * 60
+        modified = entry + rng.randint(0, 86400)
+        description = f'task {i} with "quotes" [brackets] and \\ backslash' if i % 97 == 0 else f'task {i}'
+        project = rng.choice(PROJECTS)
+        tags = rng.sample(('home', 'work', 'next', 'errand'), rng.randint(0, 2))
+        annotation = entry + 30 if i % 5 == 0 else None
+
+        legacy = {'description': description, 'entry': str(entry), 'modified': str(modified), 'status': status}
+        champion = dict(legacy)
+        expected = {'description': description, 'entry': export_date(entry), 'modified': export_date(modified), 'status': status}
+        if project:
+            legacy['project'] = champion['project'] = expected['project'] = project
+        if status == 'completed':
+            legacy['end'] = champion['end'] = str(modified)
+            expected['end'] = export_date(modified)
+        if tags:
+            legacy['tags'] = ','.join(tags)
+            for tag in tags:
+                champion[f'tag_{tag}'] = ''
+            expected['tags'] = list(tags)
+        if annotation:
+            legacy[f'annotation_{annotation}'] = champion[f'annotation_{annotation}'] = f'note for {i}'
+            expected['annotations'] = [{'entry': export_date(annotation), 'description': f'note for {i}'}]
+
+        if status in ('pending', 'waiting'):
+            pending_id += 1
+            expected['id'] = pending_id
+        else:
+            expected['id'] = 0
+        expected['uuid'] = uuid
+        tasks.append((uuid, legacy, champion, expected))
+    return tasks
+
+def encode_ff4(value):
+    value = json.dumps(value)[1:-1]
+    return value.replace('[', '&open;').replace(']', '&close;')
+
+def write_legacy(data_dir, tasks):
+    with open(os.path.join(data_dir, 'pending.data'), 'w') as pending, \
+            open(os.path.join(data_dir, 'completed.data'), 'w') as completed:
+        for uuid, legacy, _, _ in tasks:
+            attributes = dict(legacy, uuid=uuid)
+            line = '[' + ' '.join(f'{key}:"{encode_ff4(value)}"' for key, value in attributes.items()) + ']\n'
+            (pending if legacy['status'] in ('pending', 'waiting') else completed).write(line)
+
+def write_taskchampion(data_dir, tasks):
+    conn = sqlite3.connect(os.path.join(data_dir, 'taskchampion.sqlite3'))
+    conn.execute('CREATE TABLE tasks (uuid STRING PRIMARY KEY, data STRING)')
+    conn.execute('CREATE TABLE working_set (id INTEGER PRIMARY KEY, uuid STRING)')
+    task_id = 0
+    for uuid, _, champion, _ in tasks:
+        conn.execute('INSERT INTO tasks VALUES (?, ?)', (uuid, json.dumps(champion)))
+        if champion['status'] in ('pending', 'waiting'):
+            task_id += 1
+            conn.execute('INSERT INTO working_set VALUES (?, ?)', (task_id, uuid))
+    conn.commit()
+    conn.close()
+
+def without_urgency(records):
+    return {record['uuid']: {key: value for key, value in record.items() if key != 'urgency'} for record in records}
+
+def check_parity(label, records, expected):
+    mismatched = [uuid for uuid, record in expected.items() if records.get(uuid) != record]
+    missing = len(expected) - len(records)
+    print(f"{label:28} {'ok' if not mismatched and not missing else f'{len(mismatched)} mismatched, {missing} missing'}")
+    return not mismatched and not missing
+
+def timed(label, func, runs=3):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        value = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:28} {best * 1000:10.1f} ms")
+    return value
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the direct Taskwarrior backend against fixture data and time it')
+    parser.add_argument('-n', '--tasks', type=int, default=100000, help='number of fixture tasks')
+    args = parser.parse_args()
+
+    tasks = make_fixture(args.tasks)
+    expected = {uuid: record for uuid, _, _, record in tasks}
+    ok = True
+
+    with tempfile.TemporaryDirectory() as legacy_dir, tempfile.TemporaryDirectory() as champion_dir:
+        write_legacy(legacy_dir, tasks)
+        write_taskchampion(champion_dir, tasks)
+        print(f"{args.tasks} fixture tasks")
+
+        legacy = timed('direct (pending.data)', lambda: list(taskwarrior_store.read_tasks(legacy_dir)))
+        champion = timed('direct (taskchampion)', lambda: list(taskwarrior_store.read_tasks(champion_dir)))
+        ok = check_parity('parity pending.data', without_urgency(legacy), expected) and ok
+        ok = check_parity('parity taskchampion', without_urgency(champion), expected) and ok
+
+        if shutil.which('task'):
+            # `task` may migrate or garbage collect the store, so give it a copy
+            cli_dir = tempfile.mkdtemp()
+            try:
+                write_legacy(cli_dir, tasks)
+                env = dict(os.environ, TASKDATA=cli_dir, TASKRC=os.devnull)
+                command = ['task', 'rc.gc=off', 'rc.verbose=nothing', 'rc.json.array=on', 'export']
+                exported = timed('task export', lambda: json.loads(subprocess.run(command, env=env, capture_output=True, text=True).stdout))
+                ok = check_parity('parity task export', without_urgency(exported), expected) and ok
+            finally:
+                shutil.rmtree(cli_dir)
+        else:
+            print(f"{'task export':28} skipped, task is not installed")
+
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
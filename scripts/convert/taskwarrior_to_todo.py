@@ -3,10 +3,12 @@
 import json
 import argparse
 import logging
-from dateutil.parser import parse
 import os
 from datetime import datetime, timedelta
 
+# Rotate the archive into a dated segment once it grows past this size
+DEFAULT_ARCHIVE_MAX_BYTES = 1024 * 1024
+
 def main():
     logger = logging.getLogger()
     handler = logging.StreamHandler()
@@ -24,8 +26,13 @@ def main():
     parser.add_argument('-a', '--archive', help='archive location, otherwise completed tasks are stored in the same file')
     parser.add_argument('-s', '--skipCompleted', help='Ignore already completed tasks', action="store_true")
     parser.add_argument('-ns', '--noSort', help='Do not sort the results', action="store_true")
+    parser.add_argument('-aa', '--appendArchive', help='Only append newly completed tasks to the archive, tracked in per-segment uuid and date indexes', action="store_true")
+    parser.add_argument('-am', '--archiveMaxBytes', type=int, default=DEFAULT_ARCHIVE_MAX_BYTES, help='rotate the appended archive into a dated segment past this size')
 
     args = parser.parse_args()
+
+    from dateutil.parser import parse
+
     priorities = {'L': '(C)', 'M': '(B)', 'H': '(A)'}
 
     logger.debug('Starting conversion')
@@ -42,6 +49,9 @@ def main():
     result = []
     archive = []
 
+    append_archive = bool(args.archive and args.appendArchive)
+    manifest = load_manifest(args.archive) if append_archive else None
+
     # Track previously existing tasks
     previous_tasks = load_previous_tasks(args.output)
     current_tasks = {entry['description'].strip() for entry in data if 'description' in entry}
@@ -55,8 +65,12 @@ def main():
         if entry['status'] == 'completed':
             if args.skipCompleted:
                 continue
+            # Tracked by uuid: `task sync` can bring in completions with older modified times
+            if manifest and find_archive_entry(args.archive, manifest, entry.get('uuid', '')):
+                continue
+            completed_date = parse(entry.get('end', entry['modified'])).strftime('%Y-%m-%d')
             stringParts.append('x')
-            stringParts.append(parse(entry.get('end', entry['modified'])).strftime('%Y-%m-%d'))
+            stringParts.append(completed_date)
 
         if 'priority' in entry:
             stringParts.append(priorities.get(entry['priority'], '(D)'))
@@ -84,7 +98,9 @@ def main():
         if not string:
             continue
 
-        if entry['status'] == 'completed' and args.archive:
+        if entry['status'] == 'completed' and append_archive:
+            archive.append((completed_date, entry.get('uuid', ''), string))
+        elif entry['status'] == 'completed' and args.archive:
             archive.append(string)
         else:
             result.append(string)
@@ -96,7 +112,10 @@ def main():
     with open(args.output, 'w') as file:
         file.write("\n".join(result) + "\n")
 
-    if args.archive:
+    if append_archive:
+        appended = append_to_archive(args.archive, archive, args.archiveMaxBytes)
+        logger.debug(f'Appended {appended} completed tasks to {args.archive}')
+    elif args.archive:
         with open(args.archive, 'w') as file:
             file.write("\n".join(archive) + "\n")
     elif len(archive) > 0:
@@ -111,5 +130,180 @@ def load_previous_tasks(output_file):
             return {line.strip().split(' ', 1)[-1] for line in file.readlines() if line.strip()}
     return set()
 
+# Index records are fixed width so a sorted index can be binary searched with seeks
+UUID_WIDTH = 36
+OFFSET_WIDTH = 12
+RECORD_SIZE = UUID_WIDTH + 1 + 10 + 1 + OFFSET_WIDTH + 1
+
+def manifest_path(archive_file):
+    return archive_file + '.segments.json'
+
+def load_manifest(archive_file):
+    """Return the archive's segment manifest, or None if the archive has never been indexed.
+
+    The manifest lists every segment with its first/last completion date and
+    record count.
+    """
+    path = manifest_path(archive_file)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as file:
+        return json.load(file)
+
+def save_manifest(archive_file, manifest):
+    path = manifest_path(archive_file)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent=1)
+    os.replace(path + '.tmp', path)
+
+def segment_path(archive_file, segment):
+    return os.path.join(os.path.dirname(archive_file), segment)
+
+def uuid_index_path(archive_file, segment):
+    return segment_path(archive_file, segment) + '.uuid.idx'
+
+def date_index_path(archive_file, segment):
+    return segment_path(archive_file, segment) + '.date.idx'
+
+def uuid_record(uuid, completed_date, offset):
+    return f"{uuid[:UUID_WIDTH]:<{UUID_WIDTH}}\t{completed_date}\t{offset:0{OFFSET_WIDTH}d}\n"
+
+def date_record(uuid, completed_date, offset):
+    return f"{completed_date}\t{uuid[:UUID_WIDTH]:<{UUID_WIDTH}}\t{offset:0{OFFSET_WIDTH}d}\n"
+
+def read_records(path):
+    """Yield (uuid, completion date, offset) from a segment index."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r') as file:
+        for line in file:
+            first, second, offset = line.rstrip('\n').split('\t')
+            if path.endswith('.date.idx'):
+                first, second = second, first
+            yield first.rstrip(), second, int(offset)
+
+def write_index(path, records):
+    with open(path + '.tmp', 'w') as file:
+        file.writelines(records)
+    os.replace(path + '.tmp', path)
+
+def bisect_index(file, key):
+    """Return the position of the first record whose key prefix is >= key."""
+    file.seek(0, os.SEEK_END)
+    low, high = 0, file.tell() // RECORD_SIZE
+    while low < high:
+        middle = (low + high) // 2
+        file.seek(middle * RECORD_SIZE)
+        if file.read(len(key)).decode('utf-8') < key:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+def read_archived_line(archive_file, segment, offset):
+    with open(segment_path(archive_file, segment), 'rb') as file:
+        file.seek(offset)
+        return file.readline().decode('utf-8').rstrip('\n')
+
+def find_archive_entry(archive_file, manifest, uuid):
+    """Return (segment, offset) of an archived uuid, bisecting each segment's uuid index."""
+    if not uuid:
+        return None
+    key = f"{uuid[:UUID_WIDTH]:<{UUID_WIDTH}}\t"
+    for segment in reversed(manifest['segments']):
+        path = uuid_index_path(archive_file, segment['file'])
+        if not os.path.exists(path):
+            continue
+        with open(path, 'rb') as file:
+            file.seek(bisect_index(file, key) * RECORD_SIZE)
+            record = file.read(RECORD_SIZE).decode('utf-8')
+        if record.startswith(key):
+            return segment['file'], int(record.rstrip('\n').split('\t')[2])
+    return None
+
+def rotate_archive(archive_file, manifest):
+    """Move the active segment and its indexes to a dated name. Only the manifest entry changes."""
+    active = os.path.basename(archive_file)
+    stem, ext = os.path.splitext(active)
+    segment = f"{stem}-{datetime.now().strftime('%Y-%m-%d')}{ext}"
+    counter = 1
+    while os.path.exists(segment_path(archive_file, segment)):
+        counter += 1
+        segment = f"{stem}-{datetime.now().strftime('%Y-%m-%d')}.{counter}{ext}"
+
+    os.rename(archive_file, segment_path(archive_file, segment))
+    for index_path in (uuid_index_path, date_index_path):
+        if os.path.exists(index_path(archive_file, active)):
+            os.rename(index_path(archive_file, active), index_path(archive_file, segment))
+
+    manifest['segments'][-1]['file'] = segment
+    manifest['segments'].append({'file': active, 'first': None, 'last': None, 'count': 0})
+    return segment
+
+def append_to_archive(archive_file, entries, max_bytes=DEFAULT_ARCHIVE_MAX_BYTES):
+    """Append (completion date, uuid, line) entries to the active segment and index their offsets.
+
+    Only the active segment's indexes are rewritten, so the cost is bounded by
+    the segment size rather than the whole history. Without a manifest the
+    archive was written by the full rewrite mode, so it is rebuilt once from
+    the given entries instead of being appended to.
+    """
+    active = os.path.basename(archive_file)
+    manifest = load_manifest(archive_file)
+    if manifest is None:
+        manifest = {'segments': [{'file': active, 'first': None, 'last': None, 'count': 0}]}
+        mode = 'wb'
+        for index_path in (uuid_index_path, date_index_path):
+            if os.path.exists(index_path(archive_file, active)):
+                os.remove(index_path(archive_file, active))
+    else:
+        mode = 'ab'
+        if os.path.exists(archive_file) and os.path.getsize(archive_file) >= max_bytes:
+            rotate_archive(archive_file, manifest)
+
+    records = list(read_records(uuid_index_path(archive_file, active))) if mode == 'ab' else []
+    with open(archive_file, mode) as archive:
+        for completed_date, uuid, string in entries:
+            records.append((uuid, completed_date, archive.tell()))
+            archive.write((string + '\n').encode('utf-8'))
+
+    if records:
+        write_index(uuid_index_path(archive_file, active), sorted(uuid_record(*record) for record in records))
+        write_index(date_index_path(archive_file, active), sorted(date_record(*record) for record in records))
+
+    segment = manifest['segments'][-1]
+    dates = [completed_date for _, completed_date, _ in records]
+    segment.update(first=min(dates, default=None), last=max(dates, default=None), count=len(records))
+    save_manifest(archive_file, manifest)
+    return len(entries)
+
+def find_archived_task(archive_file, uuid):
+    """Return the archived todo.txt line for a Taskwarrior uuid, or None."""
+    manifest = load_manifest(archive_file)
+    found = find_archive_entry(archive_file, manifest, uuid) if manifest else None
+    return read_archived_line(archive_file, *found) if found else None
+
+def completed_between(archive_file, start, end):
+    """Yield archived lines completed between start and end (YYYY-MM-DD, inclusive).
+
+    Segments whose date range misses the window are skipped, and inside a
+    segment the date index is bisected to the first record on or after start.
+    """
+    manifest = load_manifest(archive_file)
+    if manifest is None:
+        return
+    for segment in manifest['segments']:
+        if not segment['count'] or segment['last'] < start or segment['first'] > end:
+            continue
+        with open(date_index_path(archive_file, segment['file']), 'rb') as index, \
+                open(segment_path(archive_file, segment['file']), 'rb') as archive:
+            index.seek(bisect_index(index, start) * RECORD_SIZE)
+            for record in iter(lambda: index.read(RECORD_SIZE), b''):
+                completed_date, _, offset = record.decode('utf-8').rstrip('\n').split('\t')
+                if completed_date > end:
+                    break
+                archive.seek(int(offset))
+                yield archive.readline().decode('utf-8').rstrip('\n')
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
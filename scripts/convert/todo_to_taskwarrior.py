@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 import re
 import subprocess
-import json
 import os
+import sys
+
+DEFAULT_TODO_FILE = '/mnt/c/Users/tadej/Documents/Projects/free/productivity/todo/todo.txt'
 
 PRIORITY_MAP = {chr(i): 'L' for i in range(ord('D'), ord('Z') + 1)}
 PRIORITY_MAP.update({'A': 'H', 'B': 'M', 'C': 'L'})
@@ -43,14 +45,22 @@ def map_priority(priority):
     return PRIORITY_MAP.get(priority, '')
 
 def get_existing_tasks():
-    cmd = ['task', 'export']
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    tasks = json.loads(result.stdout)
+    """Map lowercased descriptions to (id, status, task) for every task, deleted ones included.
+
+    Raises taskwarrior.TaskwarriorError if the tasks cannot be read, so a
+    failure is never mistaken for an empty Taskwarrior.
+    """
+    import taskwarrior
+
     existing_tasks = {}
-    for task in tasks:
+    for task in taskwarrior.export_tasks():
         description = task.get('description', '').strip().lower()
-        if description:
-            existing_tasks[description] = (task['id'], task['status'], task)
+        if not description:
+            continue
+        # A deleted copy never hides a live task with the same description
+        if task['status'] == 'deleted' and description in existing_tasks:
+            continue
+        existing_tasks[description] = (task['id'], task['status'], task)
     return existing_tasks
 
 def insert_task_into_taskwarrior(description, priority, tags, is_complete, completed_date, due_date, projects):
@@ -110,6 +120,8 @@ def convert_and_insert_tasks(todo_file):
             current_tasks.add(full_description)
             if full_description in existing_tasks:
                 task_id, task_status, task_data = existing_tasks[full_description]
+                if task_status == 'deleted':
+                    continue  # Deleted in Taskwarrior, do not bring it back
                 if is_complete and task_status != 'completed':
                     update_task_in_taskwarrior(task_id, full_description, completed_date, due_date, map_priority(priority), tags, projects)
                 elif not is_complete and task_status == 'completed':
@@ -120,7 +132,15 @@ def convert_and_insert_tasks(todo_file):
                 insert_task_into_taskwarrior(full_description, map_priority(priority), tags, is_complete, completed_date, due_date, projects)
     
     for description, (task_id, task_status, task_data) in existing_tasks.items():
-        if description not in current_tasks:
+        if description not in current_tasks and task_status != 'deleted':
             delete_task_from_taskwarrior(task_id)
 
-convert_and_insert_tasks('/mnt/c/Users/tadej/Documents/Projects/free/productivity/todo/todo.txt')
\ No newline at end of file
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    todo_file = argv[0] if argv else DEFAULT_TODO_FILE
+    convert_and_insert_tasks(todo_file)
+
+if __name__ == '__main__':
+    # sync.sh runs this file directly, so make the modules in scripts/ importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+
+import re
+from collections import defaultdict
+
+DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+PRIORITY_RE = re.compile(r'\([a-z]\)')
+# Known todo.txt keys only (due:2024-01-01, t:..., rec:...): "re:invoice" is part of a description
+KEY_VALUE_RE = re.compile(r'(?:due|t|rec|pri|h):[^\s:/]+')
+
+SHINGLE_SIZE = 3
+# 8 bands of 3 rows puts the LSH threshold around 0.5 similarity
+NUM_PERM = 24
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+DUPLICATE_THRESHOLD = 0.6
+
+_MASK = 0xFFFFFFFF
+_EMPTY = _MASK + 1
+
+def normalize(text):
+    """Canonical matching key for a task description from any of the three systems.
+
+    Casefolds, collapses whitespace and drops the todo.txt decorations
+    (completion mark, priority, dates, +projects, @contexts, due:/t:/rec:
+    style pairs) so the same task compares equal no matter where it was read
+    from. A description that is nothing but decorations keeps them, so it
+    still has a key of its own.
+    """
+    tokens = (text or '').casefold().split()
+
+    # Leading "x", "(a)" and dates in any order: x (a) 2024-01-02 2024-01-01 ...
+    # The "x" only counts as a completion mark before a priority or date, not in "x ray results"
+    start = 0
+    while start < len(tokens):
+        token = tokens[start]
+        is_mark = (token == 'x' and start == 0 and len(tokens) > 1
+                   and (PRIORITY_RE.fullmatch(tokens[1]) or DATE_RE.fullmatch(tokens[1])))
+        if is_mark or PRIORITY_RE.fullmatch(token) or DATE_RE.fullmatch(token):
+            start += 1
+        else:
+            break
+
+    kept = []
+    for token in tokens[start:]:
+        if len(token) > 1 and token[0] in '+@':
+            continue
+        if KEY_VALUE_RE.fullmatch(token):
+            continue
+        kept.append(token)
+    return ' '.join(kept) or ' '.join(tokens)
+
+def shingles(key):
+    """Hashed character n-grams of a normalized key."""
+    padded = f' {key} '
+    if len(padded) <= SHINGLE_SIZE:
+        return {hash(padded) & _MASK}
+    return {hash(padded[i:i + SHINGLE_SIZE]) & _MASK for i in range(len(padded) - SHINGLE_SIZE + 1)}
+
+def minhash(shingle_set):
+    """One-permutation MinHash: keep the minimum shingle hash per bin.
+
+    Shingles use the built-in str hash, so signatures are only comparable
+    within one process. That is all the in-memory index needs.
+
+    Empty bins borrow the value of the next non-empty bin (rotation
+    densification), so short descriptions still get a full signature.
+    """
+    signature = [_EMPTY] * NUM_PERM
+    for h in shingle_set:
+        slot = h % NUM_PERM
+        if h < signature[slot]:
+            signature[slot] = h
+
+    if _EMPTY in signature and any(value != _EMPTY for value in signature):
+        for slot in range(NUM_PERM):
+            distance = 1
+            while signature[slot] == _EMPTY:
+                value = signature[(slot + distance) % NUM_PERM]
+                if value != _EMPTY:
+                    signature[slot] = value + distance * _EMPTY
+                distance += 1
+    return tuple(signature)
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class MatchIndex:
+    """Exact and near-duplicate lookups over normalized task descriptions.
+
+    Exact matches are a dict lookup on normalize(). Near duplicates come from
+    MinHash signatures split into LSH bands, so a query only compares against
+    descriptions that share a band bucket instead of every indexed task. The
+    signatures are only computed once the first near-duplicate query needs
+    them, so exact-only use stays a plain dict.
+
+    Near duplicates are only good enough for a warning: "Week 12 report" and
+    "Week 13 report" are different tasks. Whether a task is already present
+    is decided by `in` alone.
+    """
+
+    def __init__(self, threshold=DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.items = {}
+        self.shingles = {}
+        self.buckets = defaultdict(list)
+        self.unsigned = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, text):
+        return normalize(text) in self.items
+
+    def add(self, text, item=None):
+        """Index text, keeping the first item seen for each normalized key."""
+        key = normalize(text)
+        if not key or key in self.items:
+            return key
+        self.items[key] = text if item is None else item
+        self.unsigned.append(key)
+        return key
+
+    def build_signatures(self):
+        for key in self.unsigned:
+            key_shingles = shingles(key)
+            self.shingles[key] = key_shingles
+            signature = minhash(key_shingles)
+            for band in range(BANDS):
+                self.buckets[(band, signature[band * ROWS:(band + 1) * ROWS])].append(key)
+        self.unsigned = []
+
+    def get(self, text, default=None):
+        return self.items.get(normalize(text), default)
+
+    def near_duplicates(self, text):
+        """Return [(key, similarity)] for indexed descriptions similar enough to warn about, most similar first."""
+        key = normalize(text)
+        if not key:
+            return []
+        self.build_signatures()
+        key_shingles = shingles(key)
+        signature = minhash(key_shingles)
+
+        candidates = set()
+        for band in range(BANDS):
+            candidates.update(self.buckets.get((band, signature[band * ROWS:(band + 1) * ROWS]), ()))
+        candidates.discard(key)
+
+        matches = []
+        for candidate in candidates:
+            similarity = jaccard(key_shingles, self.shingles[candidate])
+            if similarity >= self.threshold:
+                matches.append((candidate, similarity))
+        return sorted(matches, key=lambda match: -match[1])
@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+
+import os
+
+TODO_FILE_PATH = '/mnt/c/Users/tadej/Documents/Projects/free/productivity/todo/todo.txt'
+
+_env_loaded = False
+
+def load_env():
+    """Load the .env file once, on first use instead of at import time."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+def get_todoist_token():
+    load_env()
+    return os.getenv('TODOIST_API_TOKEN')
+
+def metadata_cache_path():
+    return os.getenv('TODOIST_METADATA_CACHE', 'todoist_metadata.json')
+
+def todoist_headers():
+    return {
+        'Authorization': f'Bearer {get_todoist_token()}',
+        'Content-Type': 'application/json'
+    }
+
+PROFILES_FILE = 'profiles.json'
+
+PROFILE_DEFAULTS = {
+    'todo_file': TODO_FILE_PATH,
+    'taskdata': None,
+    'taskrc': None,
+    'todoist_token': None,
+    'todoist_token_env': 'TODOIST_API_TOKEN',
+    'state_file': None,
+    'metadata_cache': None,
+    'taskwarrior_backend': 'cli',
+}
+
+def load_profiles(profiles_file=PROFILES_FILE):
+    """Read the profile list from a JSON file.
+
+    The file holds {"profiles": [...]}. Each profile is a dict with a unique
+    'name' and any of the keys in PROFILE_DEFAULTS. The state file defaults to
+    '<name>_state.json'. Profiles run concurrently and only lock their own
+    state file, so two profiles may not share a todo file, Taskwarrior data
+    directory, state file or metadata cache.
+    """
+    import json
+
+    with open(profiles_file, 'r') as f:
+        data = json.load(f)
+
+    profiles = []
+    seen = set()
+    for entry in data['profiles']:
+        name = entry.get('name')
+        if not name or name in seen:
+            raise ValueError(f"Profile names must be present and unique, got {name!r}")
+        seen.add(name)
+
+        profile = dict(PROFILE_DEFAULTS)
+        profile.update(entry)
+        if not profile['state_file']:
+            profile['state_file'] = f'{name}_state.json'
+        if not profile['metadata_cache']:
+            profile['metadata_cache'] = os.path.splitext(profile['state_file'])[0] + '_todoist_metadata.json'
+        profiles.append(profile)
+
+    claimed = {}
+    for profile in profiles:
+        for resource, path in profile_resources(profile):
+            other = claimed.setdefault((resource, path), profile['name'])
+            if other != profile['name']:
+                raise ValueError(f"Profiles {other!r} and {profile['name']!r} share the same {resource} {path}")
+    return profiles
+
+def profile_resources(profile):
+    """Yield (resource, resolved path) for every file a profile's sync writes to."""
+    def resolve(path):
+        return os.path.realpath(os.path.expanduser(path))
+
+    yield 'todo file', resolve(profile['todo_file'])
+    yield 'state file', resolve(profile['state_file'])
+    yield 'metadata cache', resolve(profile['metadata_cache'])
+    if profile.get('taskdata'):
+        yield 'Taskwarrior data directory', resolve(profile['taskdata'])
+    else:
+        # Without TASKDATA the data directory comes from the taskrc
+        yield 'Taskwarrior data directory (via taskrc)', resolve(profile.get('taskrc') or '~/.taskrc')
+
+_original_environ = None
+
+def original_environ():
+    """The environment (with .env loaded) as it was before any profile was applied in this process."""
+    global _original_environ
+    if _original_environ is None:
+        load_env()
+        _original_environ = dict(os.environ)
+    return _original_environ
+
+def apply_profile(profile):
+    """Point Taskwarrior and Todoist at a profile by setting this process' environment."""
+    original_environ()  # snapshot before changing anything
+    # Pool workers are reused, so unset anything a previous profile left behind
+    for key, var in (('taskdata', 'TASKDATA'), ('taskrc', 'TASKRC')):
+        if profile.get(key):
+            os.environ[var] = os.path.expanduser(profile[key])
+        else:
+            os.environ.pop(var, None)
+
+    os.environ['TODOIST_METADATA_CACHE'] = profile['metadata_cache']
+    os.environ['TASKWARRIOR_BACKEND'] = profile['taskwarrior_backend']
+
+    # Resolve from the snapshot: TODOIST_API_TOKEN below may hold a previous profile's token
+    token = profile.get('todoist_token') or original_environ().get(profile.get('todoist_token_env') or 'TODOIST_API_TOKEN')
+    if token:
+        os.environ['TODOIST_API_TOKEN'] = token
+    else:
+        # Never fall back to another profile's account
+        os.environ.pop('TODOIST_API_TOKEN', None)
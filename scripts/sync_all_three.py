@@ -2,35 +2,161 @@
 
 import subprocess
 import json
-import requests
 from datetime import datetime
-from collections import defaultdict
-from dotenv import load_dotenv
 import os
 from convert.todo_to_taskwarrior import parse_todo_txt_line
+from settings import TODO_FILE_PATH, todoist_headers
+import taskwarrior
+from matching import MatchIndex, normalize
+import work_queue
 import re
+import uuid
 
-load_dotenv()
+todo_file_path = TODO_FILE_PATH
+state_file_path = 'tasks_state.json'
 
-TODOIST_API_TOKEN = os.getenv('TODOIST_API_TOKEN')
-todo_file_path = '/mnt/c/Users/tadej/Documents/Projects/free/productivity/todo/todo.txt'
+# completed/get_all accepts at most 200 items per request
+TODOIST_COMPLETED_PAGE_SIZE = 200
 
-def sync_tasks():
-    todo_txt_tasks = load_from_todo_txt(todo_file_path)
-    taskwarrior_tasks = load_from_taskwarrior()
-    todoist_tasks = load_done_from_todoist()
+# A run whose operation keeps failing is abandoned after this many syncs
+MAX_OPERATION_ATTEMPTS = 3
 
-    all_tasks = convert_to_common_model(todo_txt_tasks, taskwarrior_tasks, todoist_tasks['items'])
+def sync_tasks(todo_file=None, state_file=None):
+    todo_file = todo_file or todo_file_path
+    state_file = state_file or state_file_path
+
+    # A crashed or failed run is finished first; the next run picks up anything newer
+    resumed = resume_sync(state_file)
+    if resumed is not None:
+        return resumed
+
+    todo_txt_tasks = load_from_todo_txt(todo_file)
+    taskwarrior_watermark_file = taskwarrior_watermark_path(state_file)
+    taskwarrior_tasks, taskwarrior_watermark = load_from_taskwarrior(taskwarrior.load_watermark(taskwarrior_watermark_file))
+    todoist_cursor = load_todoist_cursor(state_file)
+    todoist_tasks = load_done_from_todoist(todoist_cursor)
+
+    all_tasks = convert_to_common_model(todo_txt_tasks, taskwarrior_tasks, todoist_tasks)
 
     done_tasks = detect_done_tasks(all_tasks)
 
-    deleted_tasks = detect_deleted_tasks(all_tasks)
+    deleted_tasks = detect_deleted_tasks(all_tasks, state_file)
+
+    run_state = {
+        'run_token': str(uuid.uuid4()),
+        'all_tasks': all_tasks,
+        'todoist_cursor': todoist_cursor,
+        'taskwarrior_watermark': taskwarrior_watermark,
+        'summary': {'tasks': len(all_tasks), 'done': len(done_tasks), 'deleted': len(deleted_tasks)},
+    }
+    operations = plan_operations(all_tasks, done_tasks, deleted_tasks, todo_file)
+
+    queue = work_queue.open_queue(queue_path(state_file))
+    try:
+        run_id = work_queue.start_run(queue, operations, run_state)
+        return execute_run(queue, run_id, run_state, state_file)
+    finally:
+        queue.close()
+
+def resume_sync(state_file):
+    """Finish a run that was interrupted or had failures, returning its summary, or None if there is nothing to resume."""
+    queue = work_queue.open_queue(queue_path(state_file))
+    try:
+        run = work_queue.unfinished_run(queue)
+        if run is None:
+            return None
+        run_id, run_state = run
+        print(f"Resuming unfinished sync run {run_id}")
+        return execute_run(queue, run_id, run_state, state_file)
+    finally:
+        queue.close()
+
+def queue_path(state_file):
+    return os.path.splitext(state_file)[0] + '_queue.sqlite3'
+
+def plan_operations(all_tasks, done_tasks, deleted_tasks, todo_file):
+    """Turn the detected changes into (kind, idempotency key, payload) operations, in execution order."""
+    operations = [('todo_txt', f'todo_txt:{todo_file}', {
+        'todo_file': todo_file,
+        'done': [{'description': task['description']} for task in done_tasks],
+        'deleted': [task for task in deleted_tasks if isinstance(task, dict)],
+    })]
+
+    # Only tasks still open in Taskwarrior need marking done there; Taskwarrior's
+    # own completions and tasks it never had would fail `task done` every run
+    open_in_taskwarrior = {task['description']: task['id'] for task in all_tasks
+                           if task['source'] == 'taskwarrior' and not task['is_completed']}
+    for task in done_tasks:
+        task_uuid = open_in_taskwarrior.get(task['description'])
+        if task_uuid:
+            operations.append(('taskwarrior_done', f'taskwarrior_done:{task_uuid}',
+                               {'description': task['description'], 'uuid': task_uuid}))
+
+    todoist_index = index_todoist_tasks(load_from_todoist())
+    for task in done_tasks:
+        task_id = todoist_index.get(task['description'])
+        if task_id:
+            operations.append(('todoist_close', f'todoist_close:{task_id}', {'task_id': task_id}))
+
+    for task in deleted_tasks:
+        if not isinstance(task, dict):
+            print(f"Warning: Expected dict in deleted_tasks, got {type(task)}")
+            continue
+        print(f"updating task {task} in todoist (is deleted)")
+        task_id = todoist_index.get(task['description'])
+        if task_id:
+            operations.append(('todoist_delete', f'todoist_delete:{task_id}', {'task_id': task_id}))
+    return operations
+
+def execute_run(queue, run_id, run_state, state_file):
+    """Apply the run's remaining operations, checkpointing each one, then commit the run's state.
+
+    A failed operation stays pending and the run stays open, so the state
+    and watermarks are only committed once every operation went through; the
+    next sync retries it first. After MAX_OPERATION_ATTEMPTS failures the run
+    is abandoned without committing anything, and the next sync detects its
+    changes again from the last committed state.
+    """
+    handlers = {
+        'todo_txt': lambda payload, request_id: update_todo_txt(payload['done'], payload['deleted'], payload['todo_file']),
+        'taskwarrior_done': lambda payload, request_id: mark_done_in_taskwarrior(payload['description'], payload.get('uuid')),
+        'todoist_close': lambda payload, request_id: close_todoist_task(payload['task_id'], request_id),
+        'todoist_delete': lambda payload, request_id: delete_todoist_task(payload['task_id'], request_id),
+    }
+
+    retrying = []
+    exhausted = []
+    for key, kind, payload in work_queue.pending_operations(queue, run_id):
+        # Todoist drops a repeated X-Request-Id, so an operation that was sent
+        # right before a crash is not applied again when it is replayed
+        request_id = str(uuid.uuid5(uuid.UUID(run_state['run_token']), key))
+        try:
+            succeeded = handlers[kind](payload, request_id) is not False
+        except Exception as e:
+            print(f"Error applying {key}: {e}")
+            succeeded = False
+
+        if succeeded:
+            work_queue.checkpoint(queue, run_id, key)
+        elif work_queue.record_failure(queue, run_id, key) >= MAX_OPERATION_ATTEMPTS:
+            exhausted.append(key)
+        else:
+            retrying.append(key)
+
+    if exhausted:
+        print(f"Abandoning sync run {run_id} after {MAX_OPERATION_ATTEMPTS} failed attempts at {', '.join(exhausted)}")
+        work_queue.finish_run(queue, run_id)
+        return dict(run_state['summary'], abandoned=exhausted)
 
-    update_todo_txt(done_tasks, deleted_tasks, todo_file_path)
-    update_taskwarrior(done_tasks)
-    update_todoist(done_tasks, deleted_tasks)
+    if retrying:
+        print(f"Sync run {run_id} left {len(retrying)} failed operations pending, they are retried on the next sync")
+        return dict(run_state['summary'], retrying=retrying)
 
-    save_current_state(all_tasks)
+    save_current_state(run_state['all_tasks'], state_file)
+    save_todoist_cursor(run_state['todoist_cursor'], state_file)
+    taskwarrior.save_watermark(taskwarrior_watermark_path(state_file), run_state['taskwarrior_watermark'])
+    work_queue.finish_run(queue, run_id)
+    return run_state['summary']
 
 def load_from_todo_txt(todo_file):
     tasks = []
@@ -57,35 +183,89 @@ def map_todotxt_priority(priority):
     priority_map = {'C': 'Low', 'B': 'Medium', 'A': 'High'}
     return priority_map.get(priority, 'None')
 
-def load_from_taskwarrior():
-    command = ['task', 'export']
-    try:
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        tasks = json.loads(result.stdout)
-        return tasks
-    except subprocess.CalledProcessError as e:
-        print(f"Error loading tasks from Taskwarrior: {e}")
-        return []
+def load_from_taskwarrior(modified_after=None):
+    """Load every open task, but only the tasks completed since the last run.
 
-def load_done_from_todoist():
-    headers = {
-        'Authorization': f'Bearer {TODOIST_API_TOKEN}',
-        'Content-Type': 'application/json'
-    }
+    Returns (tasks, watermark). The watermark is the newest completed task's
+    modified time, or None when the completed tasks could not be read, so a
+    failed export is retried next run instead of being skipped for good. A
+    failure to read the open tasks is raised: syncing against an empty list
+    would look like every task had been deleted.
+    """
+    open_filter = {'status': ['pending', 'waiting']}
     try:
-        response = requests.get('https://api.todoist.com/sync/v9/completed/get_all', headers=headers)
-        response.raise_for_status()
-        tasks = response.json()
-        return tasks
-    except requests.exceptions.RequestException as e:
-        print(f"Error loading tasks from Todoist: {e}")
-        return []
+        tasks, completed = taskwarrior.export_task_sets([open_filter, {'status': 'completed', 'modified_after': modified_after}])
+    except taskwarrior.TaskwarriorError as e:
+        print(f"{e}; completed Taskwarrior tasks are picked up next run")
+        return taskwarrior.export_tasks(**open_filter), None
+    return tasks + completed, taskwarrior.newest_modified(completed, modified_after)
+
+def taskwarrior_watermark_path(state_file):
+    return os.path.splitext(state_file)[0] + '_taskwarrior_watermark.json'
+
+def load_done_from_todoist(cursor, page_size=TODOIST_COMPLETED_PAGE_SIZE):
+    """Yield Todoist tasks completed since cursor['since'], one page at a time.
+
+    The newest completion seen is recorded in cursor['watermark'] and
+    cursor['complete'] is only set once every page has been read, so a failed
+    run never moves the watermark past items it did not get.
+    """
+    import requests
+
+    headers = todoist_headers()
+    params = {'limit': page_size, 'offset': 0}
+    if cursor.get('since'):
+        params['since'] = cursor['since']
+    cursor['complete'] = False
+
+    while True:
+        try:
+            response = requests.get('https://api.todoist.com/sync/v9/completed/get_all', headers=headers, params=params)
+            response.raise_for_status()
+            items = response.json().get('items', [])
+        except requests.exceptions.RequestException as e:
+            print(f"Error loading tasks from Todoist: {e}")
+            return
+
+        for item in items:
+            completed_at = todoist_since(item.get('completed_at'))
+            if completed_at and completed_at > (cursor.get('watermark') or ''):
+                cursor['watermark'] = completed_at
+            yield item
+
+        if len(items) < page_size:
+            break
+        params['offset'] += len(items)
+
+    cursor['complete'] = True
+
+def todoist_since(completed_at):
+    """Convert a completed_at timestamp to the format the `since` parameter expects."""
+    if not completed_at:
+        return ''
+    return completed_at[:19]
+
+def todoist_cursor_path(state_file):
+    return os.path.splitext(state_file)[0] + '_todoist_cursor.json'
+
+def load_todoist_cursor(state_file='tasks_state.json'):
+    path = todoist_cursor_path(state_file)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return {'since': json.load(f).get('since')}
+    return {'since': None}
+
+def save_todoist_cursor(cursor, state_file='tasks_state.json'):
+    """Persist the watermark, but only if the completed feed was read to the end."""
+    if not cursor.get('complete') or not cursor.get('watermark'):
+        return
+    with open(todoist_cursor_path(state_file), 'w') as f:
+        json.dump({'since': cursor['watermark']}, f)
 
 def load_from_todoist():
-    headers = {
-        'Authorization': f'Bearer {TODOIST_API_TOKEN}',
-        'Content-Type': 'application/json'
-    }
+    import requests
+
+    headers = todoist_headers()
     try:
         response = requests.get('https://api.todoist.com/rest/v3/tasks', headers=headers)
         response.raise_for_status()
@@ -101,7 +281,7 @@ def convert_to_common_model(todo_txt_tasks, taskwarrior_tasks, todoist_tasks):
     for task in todo_txt_tasks:
         common_tasks.append({
             'id': task.get('id') or task.get('uuid', ''),
-            'description': task.get('description', '').strip().lower(),
+            'description': normalize(task.get('description', '')),
             'is_completed': task.get('is_completed', False),
             'priority': task.get('priority', 'None'),
             'due_date': task.get('due_date', ''),
@@ -113,7 +293,7 @@ def convert_to_common_model(todo_txt_tasks, taskwarrior_tasks, todoist_tasks):
     for task in taskwarrior_tasks:
         common_tasks.append({
             'id': task.get('uuid', ''),
-            'description': task.get('description', '').strip().lower(),
+            'description': normalize(task.get('description', '')),
             'is_completed': task.get('status') == 'completed',
             'priority': task.get('priority', ''),
             'due_date': task.get('due', ''),
@@ -125,7 +305,7 @@ def convert_to_common_model(todo_txt_tasks, taskwarrior_tasks, todoist_tasks):
     for task in todoist_tasks:
         common_tasks.append({
             'id': task.get('id', ''),
-            'description': task.get('content', '').strip().lower(),
+            'description': normalize(task.get('content', '')),
             'is_completed': True,
             'priority': task.get('priority', ''),
             'due_date': task.get('due', {}).get('date', '') if task.get('due') else '',
@@ -145,8 +325,11 @@ def detect_done_tasks(all_tasks):
     
     return done_tasks
 
-def detect_deleted_tasks(all_tasks):
-    previous_tasks = load_previous_state()
+def detect_deleted_tasks(all_tasks, state_file='tasks_state.json'):
+    # Todoist and Taskwarrior completions are read incrementally, so a
+    # completion missing from this run's window is not a deletion
+    previous_tasks = [task for task in load_previous_state(state_file)
+                      if not (task.get('is_completed') and task.get('source') in ('todoist', 'taskwarrior'))]
 
     previous_task_descriptions = {task['description'] for task in previous_tasks}
     current_task_descriptions = {task['description'] for task in all_tasks}
@@ -166,14 +349,14 @@ def update_todo_txt(done_tasks, deleted_tasks, todo_file):
     done_tasks_set = set()
     for task in done_tasks:
         if isinstance(task, dict) and 'description' in task:
-            done_tasks_set.add(task['description'].strip())
+            done_tasks_set.add(normalize(task['description']))
         else:
             print(f"Warning: Expected dict in done_tasks, got {type(task)}")
 
     deleted_tasks_set = set()
     for task in deleted_tasks:
         if isinstance(task, dict) and 'description' in task:
-            deleted_tasks_set.add(task['description'].strip())
+            deleted_tasks_set.add(normalize(task['description']))
         else:
             print(f"Warning: Expected dict in deleted_tasks, got {type(task)}")
 
@@ -183,38 +366,24 @@ def update_todo_txt(done_tasks, deleted_tasks, todo_file):
             continue
 
         is_complete = line_stripped.startswith('x ')
-        has_project = line_stripped.startswith("(")
-        task_priority = line_stripped[:2]
-        created_date = ""
-        if is_complete:
-            created_date = line_stripped.split(" ")[3]
-        else:
-            created_date = line_stripped.split(" ")[1]
-        task_description = re.split(r'[+@]|due:', line_stripped)[0]
-        if is_complete and not has_project:
-            task_description = task_description[3:]
-        elif is_complete and has_project:
-            task_description = task_description[5:]
-        elif not is_complete and has_project:
-            task_description = task_description[1:]
-        elif not is_complete and not has_project:
-            task_description = task_description
-
-        task_description = task_description.strip()
-        if task_description in processed_tasks or task_description in deleted_tasks_set:
+        key = normalize(line_stripped)
+        if key in processed_tasks or key in deleted_tasks_set:
             continue
         
-        if done_tasks_set.__contains__(task_description):
+        if done_tasks_set.__contains__(key):
             if not is_complete:
                 completion_date = datetime.now().strftime("%Y-%m-%d")
-                updated_tasks.append(f"x {task_priority} {completion_date} {created_date} {task_description}\n")
+                priority_match = re.match(r'\(([A-Z])\)\s+', line_stripped)
+                rest = line_stripped[priority_match.end():] if priority_match else line_stripped
+                task_priority = f"{priority_match.group(0).strip()} " if priority_match else ''
+                updated_tasks.append(f"x {task_priority}{completion_date} {rest}\n")
             else:
                 updated_tasks.append(line_stripped + '\n')
-            done_tasks_set.remove(task_description)
-        elif task_description not in done_tasks_set and task_description not in deleted_tasks_set:
+            done_tasks_set.remove(key)
+        elif key not in done_tasks_set and key not in deleted_tasks_set:
             updated_tasks.append(line_stripped + '\n')
 
-        processed_tasks.add(task_description)
+        processed_tasks.add(key)
 
     with open(todo_file, 'w') as file:
         file.writelines(updated_tasks)
@@ -225,58 +394,78 @@ def is_task_completed(task):
     """Check if a task is marked as completed."""
     return task.get('status', '') == 'completed'
 
-def update_taskwarrior(tasks):
-    for task in tasks:
-        description = task['description']
-        if task['is_completed']:
-            try:
-                result = subprocess.run(['task', description, 'done'], check=True, text=True, capture_output=True)
-                print(f"Marked task '{description}' as completed in Taskwarrior")
-            except subprocess.CalledProcessError as e:
-                print(f"Error marking task '{description}' as completed in Taskwarrior: {e}")
-        else:
-            return
+def mark_done_in_taskwarrior(description, task_uuid=None):
+    """Complete a task by uuid (or description). A task that is already completed counts as done, so a replay succeeds."""
+    try:
+        subprocess.run(['task', task_uuid or description, 'done'], check=True, text=True, capture_output=True)
+        print(f"Marked task '{description}' as completed in Taskwarrior")
+        return True
+    except subprocess.CalledProcessError as e:
+        if task_uuid and is_completed_in_taskwarrior(task_uuid):
+            print(f"Task '{description}' is already completed in Taskwarrior")
+            return True
+        print(f"Error marking task '{description}' as completed in Taskwarrior: {e}")
+        return False
 
-def update_todoist(done_tasks, deleted_tasks):
-    headers = {
-        'Authorization': f'Bearer {TODOIST_API_TOKEN}',
-        'Content-Type': 'application/json'
-    }
+def is_completed_in_taskwarrior(task_uuid):
+    try:
+        result = subprocess.run(['task', 'rc.verbose=nothing', 'rc.json.array=on', task_uuid, 'export'],
+                                check=True, text=True, capture_output=True)
+        return any(is_task_completed(task) for task in json.loads(result.stdout or '[]'))
+    except (subprocess.CalledProcessError, ValueError):
+        return False
+
+def index_todoist_tasks(todoist_tasks):
+    """Index open Todoist task ids by normalized content, falling back to their description."""
+    index = MatchIndex()
+    for task in todoist_tasks:
+        index.add(task.get('content', ''), task['id'])
+    for task in todoist_tasks:
+        index.add(task.get('description', ''), task['id'])
+    return index
 
-    for task in done_tasks:
-        todoist_tasks = load_from_todoist()
-        task_id = next((t['id'] for t in todoist_tasks if t['description']== task['description'] or t['content'] == task['description']), None)
+def close_todoist_task(task_id, request_id=None):
+    import requests
 
-        if task_id:
-            try:
-                response = requests.post(f'https://api.todoist.com/rest/v3/tasks/{task_id}/close', headers=headers)
-                response.raise_for_status()
-                print(f"Marked task '{task_id}' as completed in Todoist")
-            except requests.exceptions.RequestException as e:
-                print(f"Error marking task '{task_id}' as completed in Todoist: {e}")
+    headers = todoist_headers()
+    if request_id:
+        headers['X-Request-Id'] = request_id
+    try:
+        response = requests.post(f'https://api.todoist.com/rest/v3/tasks/{task_id}/close', headers=headers)
+        response.raise_for_status()
+        print(f"Marked task '{task_id}' as completed in Todoist")
+        return True
+    except requests.exceptions.RequestException as e:
+        print(f"Error marking task '{task_id}' as completed in Todoist: {e}")
+        return False
 
-    for task in deleted_tasks:
-        print(f"updating task {task} in todoist (is deleted)")
-        todoist_tasks = load_from_todoist()
-        task_id = next((t['id'] for t in todoist_tasks if t['description'] == task['description'] or t['content'] == task['description']), None)
+def delete_todoist_task(task_id, request_id=None):
+    import requests
 
-        if task_id:
-            try:
-                response = requests.delete(f'https://api.todoist.com/rest/v3/tasks/{task_id}', headers=headers)
-                response.raise_for_status()
-                print(f"Deleted task '{task_id}' from Todoist")
-            except requests.exceptions.RequestException as e:
-                print(f"Error deleting task '{task_id}' from Todoist: {e}")
-
-def save_current_state(all_tasks):
-    with open('tasks_state.json', 'w') as f:
+    headers = todoist_headers()
+    if request_id:
+        headers['X-Request-Id'] = request_id
+    try:
+        response = requests.delete(f'https://api.todoist.com/rest/v3/tasks/{task_id}', headers=headers)
+        response.raise_for_status()
+        print(f"Deleted task '{task_id}' from Todoist")
+        return True
+    except requests.exceptions.RequestException as e:
+        print(f"Error deleting task '{task_id}' from Todoist: {e}")
+        return False
+
+def save_current_state(all_tasks, state_file='tasks_state.json'):
+    with open(state_file, 'w') as f:
         json.dump(all_tasks, f)
 
-def load_previous_state():
-    if os.path.exists('tasks_state.json'):
-        with open('tasks_state.json', 'r') as f:
+def load_previous_state(state_file='tasks_state.json'):
+    if os.path.exists(state_file):
+        with open(state_file, 'r') as f:
             return json.load(f)
     return []
 
+def main():
+    sync_tasks()
+
 if __name__ == '__main__':
-    sync_tasks()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+
+import argparse
+import fcntl
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from settings import PROFILES_FILE, apply_profile, load_profiles
+
+DEFAULT_MAX_WORKERS = 4
+
+def sync_profile(profile):
+    """Run the full sync for one profile. Executed inside a pool worker."""
+    result = {'profile': profile['name'], 'ok': False, 'skipped': False, 'error': None, 'summary': None}
+    start = time.monotonic()
+
+    lock_path = profile['state_file'] + '.lock'
+    with open(lock_path, 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            result['skipped'] = True
+            result['error'] = f"another sync holds {lock_path}"
+            return result
+
+        try:
+            apply_profile(profile)
+
+            import sync_all_three
+            import sync_todoist_taskwarrior
+
+            result['summary'] = sync_all_three.sync_tasks(profile['todo_file'], profile['state_file'])
+            sync_todoist_taskwarrior.main()
+            summary = result['summary'] or {}
+            if summary.get('abandoned'):
+                result['error'] = f"sync run abandoned after repeated failures at {', '.join(summary['abandoned'])}"
+            elif summary.get('retrying'):
+                result['error'] = f"sync run left {', '.join(summary['retrying'])} pending for the next sync"
+            else:
+                result['ok'] = True
+        except Exception as e:
+            result['error'] = f"{e}\n{traceback.format_exc()}"
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    result['duration'] = time.monotonic() - start
+    return result
+
+def sync_profiles(profiles, max_workers=DEFAULT_MAX_WORKERS):
+    """Sync profiles concurrently, at most max_workers at a time. Returns {name: result}."""
+    results = {}
+    if not profiles:
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(profiles))) as pool:
+        futures = {pool.submit(sync_profile, profile): profile['name'] for profile in profiles}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                # The worker process itself died
+                results[name] = {'profile': name, 'ok': False, 'skipped': False, 'error': str(e), 'summary': None}
+    return results
+
+def print_results(results):
+    for name in sorted(results):
+        result = results[name]
+        if result['ok']:
+            print(f"[{name}] ok in {result['duration']:.1f}s: {result['summary']}")
+        elif result['skipped']:
+            print(f"[{name}] skipped: {result['error']}")
+        else:
+            print(f"[{name}] failed: {result['error']}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync several todo.txt/Taskwarrior/Todoist profiles in parallel')
+    parser.add_argument('-c', '--config', default=PROFILES_FILE, help='profiles JSON file')
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_MAX_WORKERS, help='maximum profiles synced at once')
+    parser.add_argument('-p', '--profile', action='append', help='only sync the named profile (repeatable)')
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.config)
+    if args.profile:
+        profiles = [profile for profile in profiles if profile['name'] in args.profile]
+
+    results = sync_profiles(profiles, max(1, args.jobs))
+    print_results(results)
+    return 0 if all(result['ok'] for result in results.values()) else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
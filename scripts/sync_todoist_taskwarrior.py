@@ -1,16 +1,17 @@
 #!/usr/bin/python3
 
-import requests
 import subprocess
 import json
-from datetime import datetime
-import pytz
-from dotenv import load_dotenv
 import os
+import time
+from datetime import datetime
 
-load_dotenv()
+from settings import metadata_cache_path, todoist_headers
+import taskwarrior
+from matching import MatchIndex
 
-TODOIST_API_TOKEN = os.getenv('TODOIST_API_TOKEN')
+# Projects and labels rarely change, revalidate the cached copy once a day
+METADATA_TTL = 24 * 60 * 60
 
 def map_priority(taskwarrior_priority):
     priority_map = {
@@ -30,43 +31,122 @@ def priority_map(todoist_priority):
     }
     return map_priority.get(todoist_priority, None)
 
-def fetch_projects():
-    headers = {
-        'Authorization': f'Bearer {TODOIST_API_TOKEN}',
-        'Content-Type': 'application/json'
-    }
-    try:
-        response = requests.get('https://api.todoist.com/rest/v2/projects', headers=headers)
-        response.raise_for_status()
-        projects = response.json()
-        name_to_id = {project['name']: project['id'] for project in projects}
-        id_to_name = {project['id']: project['name'] for project in projects}
-        return name_to_id, id_to_name
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching projects from Todoist: {e}")
-        return {}, {}
+def load_metadata_cache(cache_file):
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r') as f:
+                return json.load(f)
+        except ValueError:
+            print(f"Ignoring unreadable metadata cache {cache_file}")
+    return None
 
-def fetch_labels():
-    headers = {
-        'Authorization': f'Bearer {TODOIST_API_TOKEN}',
-        'Content-Type': 'application/json'
-    }
+def save_metadata_cache(cache, cache_file):
+    with open(cache_file + '.tmp', 'w') as f:
+        json.dump(cache, f)
+    os.replace(cache_file + '.tmp', cache_file)
+
+def apply_metadata_changes(mapping, items):
+    """Apply a full or incremental list of projects/labels to an id -> name dict."""
+    for item in items:
+        if item.get('is_deleted') or item.get('is_archived'):
+            mapping.pop(item['id'], None)
+        else:
+            mapping[item['id']] = item['name']
+
+def fetch_metadata(force=False, cache_file=None, max_age=METADATA_TTL):
+    """Return the cached {'projects': {id: name}, 'labels': {id: name}} maps.
+
+    Past max_age (or when forced) the cache is revalidated through the sync
+    API with the stored sync token, so an unchanged account costs one small
+    request. If Todoist is unreachable the stale cache is served instead.
+    """
+    import requests
+
+    cache_file = cache_file or metadata_cache_path()
+    cache = load_metadata_cache(cache_file)
+    if cache and not force and time.time() - cache.get('fetched_at', 0) < max_age:
+        return cache
+
+    sync_token = cache.get('sync_token', '*') if cache else '*'
     try:
-        response = requests.get('https://api.todoist.com/rest/v2/labels', headers=headers)
+        response = requests.post('https://api.todoist.com/sync/v9/sync', headers=todoist_headers(),
+                                 data={'sync_token': sync_token, 'resource_types': '["projects", "labels"]'})
         response.raise_for_status()
-        labels = response.json()
-        id_to_name = {label['id']: label['name'] for label in labels}
-        name_to_id = {label['name']: label['id'] for label in labels}
-        return name_to_id, id_to_name
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching labels from Todoist: {e}")
-        return {}, {}
+        data = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        if cache:
+            print(f"Error refreshing projects and labels from Todoist, using cached copy: {e}")
+            return cache
+        print(f"Error fetching projects and labels from Todoist: {e}")
+        return {'projects': {}, 'labels': {}}
+
+    if data.get('full_sync') or not cache:
+        cache = {'projects': {}, 'labels': {}}
+    apply_metadata_changes(cache['projects'], data.get('projects', []))
+    apply_metadata_changes(cache['labels'], data.get('labels', []))
+    cache['sync_token'] = data.get('sync_token', sync_token)
+    cache['fetched_at'] = time.time()
+    save_metadata_cache(cache, cache_file)
+    return cache
+
+def metadata_mappings(metadata):
+    """Derive (project name -> id, project id -> name, label name -> id, label id -> name) from one fetch_metadata result."""
+    project_names = dict(metadata['projects'])
+    label_names = dict(metadata['labels'])
+    project_ids = {name: project_id for project_id, name in project_names.items()}
+    label_ids = {name: label_id for label_id, name in label_names.items()}
+    return project_ids, project_names, label_ids, label_names
+
+def fetch_projects(force=False):
+    name_to_id, id_to_name, _, _ = metadata_mappings(fetch_metadata(force))
+    return name_to_id, id_to_name
+
+def fetch_labels(force=False):
+    _, _, name_to_id, id_to_name = metadata_mappings(fetch_metadata(force))
+    return name_to_id, id_to_name
+
+class TodoistMetadata:
+    """Project and label lookups built from a single fetch_metadata read.
+
+    A lookup that misses revalidates the cache, but each project or label
+    costs at most one refresh per run, so a name that really does not exist
+    in Todoist is not looked up over and over.
+    """
+
+    def __init__(self):
+        self.refreshed = set()
+        self.load(fetch_metadata())
+
+    def load(self, metadata):
+        self.project_ids, self.project_names, self.label_ids, self.label_names = metadata_mappings(metadata)
+
+    def refresh(self, key):
+        """Revalidate the cache unless key already caused a refresh; return whether it did."""
+        if key in self.refreshed:
+            return False
+        self.refreshed.add(key)
+        self.load(fetch_metadata(force=True))
+        return True
+
+    def project_id(self, name):
+        if name not in self.project_ids:
+            self.refresh(('project', name))
+        return self.project_ids.get(name)
+
+    def project_name(self, project_id):
+        if project_id not in self.project_names:
+            self.refresh(('project_id', project_id))
+        return self.project_names.get(project_id)
+
+    def has_label(self, name):
+        if name not in self.label_ids:
+            self.refresh(('label', name))
+        return name in self.label_ids
 
 def fetch_tasks():
-    headers = {
-        'Authorization': f'Bearer {TODOIST_API_TOKEN}',
-        'Content-Type': 'application/json'
-    }
+    import requests
+
+    headers = todoist_headers()
     tasks = []
     url = 'https://api.todoist.com/rest/v2/tasks'
     
@@ -85,18 +165,15 @@ def fetch_tasks():
     return tasks
 
 def fetch_taskwarrior_tasks():
-    try:
-        result = subprocess.run(['task', 'export'], capture_output=True, text=True)
-        tasks = json.loads(result.stdout)
-        return tasks
-    except Exception as e:
-        print(f"Error fetching Taskwarrior tasks: {e}")
-        return []
+    # Completed and deleted tasks are still needed so their Todoist copies are not re-added
+    return taskwarrior.export_tasks()
 
 def convert_due_date(due_date_str):
     if due_date_str is None:
         return None, None
 
+    import pytz
+
     try:
         if len(due_date_str) == 16 and due_date_str[8] == 'T' and due_date_str[-1] == 'Z':
             parsed_date = datetime.strptime(due_date_str, '%Y%m%dT%H%M%SZ')
@@ -141,10 +218,9 @@ def add_task_to_taskwarrior(task):
         print(f"Error adding task to Taskwarrior: {e}")
 
 def add_task_to_todoist(task, project_mapping, label_mapping):
-    headers = {
-        'Authorization': f'Bearer {TODOIST_API_TOKEN}',
-        'Content-Type': 'application/json'
-    }
+    import requests
+
+    headers = todoist_headers()
     try:
         due_date, due_datetime = convert_due_date(task.get('due'))
 
@@ -171,29 +247,47 @@ def add_task_to_todoist(task, project_mapping, label_mapping):
     except requests.exceptions.RequestException as e:
         print(f"Error adding task to Todoist: {e}")
 
+def warn_near_duplicate(description, index, target):
+    """Point out a task being added that looks like one already in the target, without skipping it."""
+    matches = index.near_duplicates(description)
+    if matches:
+        print(f"Warning: adding '{description}' to {target}, it looks similar to '{index.items[matches[0][0]]}'")
+
+def post_todoist_task(data):
+    import requests
+
+    response = requests.post('https://api.todoist.com/rest/v2/tasks', headers=todoist_headers(), json=data)
+    response.raise_for_status()
+    return response
+
 def sync_tasks(todoist_tasks, taskwarrior_tasks):
-    name_to_id, id_to_name = fetch_projects()
-    if not name_to_id:
+    import requests
+
+    metadata = TodoistMetadata()
+
+    if not metadata.project_ids:
         print("No projects found in Todoist. Please create a project first.")
         return
 
-    label_mapping, _ = fetch_labels()
-    if not label_mapping:
+    if not metadata.label_ids:
         print("No labels found in Todoist. Please create labels first.")
         return
 
-    todoist_task_descriptions = {task['content'] for task in todoist_tasks}
+    todoist_index = MatchIndex()
+    for task in todoist_tasks:
+        todoist_index.add(task['content'])
 
     for task in taskwarrior_tasks:
-        if task['status'] == 'completed':
-            continue  # Skip completed tasks
+        if task['status'] in ('completed', 'deleted'):
+            continue  # Skip completed and deleted tasks
 
-        if task['description'] not in todoist_task_descriptions:
+        if task['description'] not in todoist_index:
+            warn_near_duplicate(task['description'], todoist_index, 'Todoist')
             try:
                 due_date, due_datetime = convert_due_date(task.get('due'))
 
                 task_project_name = task.get('project', 'Default Project')
-                project_id = name_to_id.get(task_project_name, None)
+                project_id = metadata.project_id(task_project_name)
 
                 task_priority = task.get('priority', None)
                 todoist_priority = map_priority(task_priority)
@@ -208,32 +302,42 @@ def sync_tasks(todoist_tasks, taskwarrior_tasks):
                     'priority': todoist_priority,
                     'labels': task_tags
                 }
-                headers = {
-                    'Authorization': f'Bearer {TODOIST_API_TOKEN}',
-                    'Content-Type': 'application/json'
-                }
-                response = requests.post('https://api.todoist.com/rest/v2/tasks', headers=headers, json=data)
-                response.raise_for_status()
+                try:
+                    post_todoist_task(data)
+                except requests.exceptions.HTTPError as e:
+                    # A rejected write usually means the cached project id is gone
+                    if not (400 <= e.response.status_code < 500 and metadata.refresh(('project', task_project_name))):
+                        raise
+                    data['project_id'] = metadata.project_ids.get(task_project_name)
+                    post_todoist_task(data)
                 print(f"Added task to Todoist: {task['description']}")
             except requests.exceptions.RequestException as e:
                 print(f"Error adding task to Todoist: {e}")
 
-    taskwarrior_tasks_set = {task['description'] for task in taskwarrior_tasks}
+    taskwarrior_index = MatchIndex()
+    for task in taskwarrior_tasks:
+        taskwarrior_index.add(task['description'])
 
     for task in todoist_tasks:
-        if task['content'] not in taskwarrior_tasks_set:
+        if task['content'] not in taskwarrior_index:
+            warn_near_duplicate(task['content'], taskwarrior_index, 'Taskwarrior')
             task_data = {
                 'description': task['content'],
                 'due': task.get('due_date', None),
                 'priority': task.get('priority', None),
-                'project': id_to_name.get(task.get('project_id', None), 'Default Project'),
-                'tags': [label for label in task.get('labels', []) if label in label_mapping]
+                'project': metadata.project_name(task.get('project_id', None)) or 'Default Project',
+                'tags': [label for label in task.get('labels', []) if metadata.has_label(label)]
             }
             add_task_to_taskwarrior(task_data)
 
 def main():
     todoist_tasks = fetch_tasks()
-    taskwarrior_tasks = fetch_taskwarrior_tasks()
+    try:
+        taskwarrior_tasks = fetch_taskwarrior_tasks()
+    except taskwarrior.TaskwarriorError as e:
+        # An empty list would re-add every Todoist task to Taskwarrior
+        print(e)
+        return
     sync_tasks(todoist_tasks, taskwarrior_tasks)
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+
+import json
+import os
+import subprocess
+
+# 'cli' runs `task export`, 'direct' reads the data store without forking task
+DEFAULT_BACKEND = 'cli'
+
+class TaskwarriorError(Exception):
+    """Raised when tasks could not be read, so callers never mistake a failure for an empty list."""
+
+def format_date(value):
+    """Turn Taskwarrior's 20240101T100000Z into the 2024-01-01T10:00:00Z form filters accept."""
+    if len(value) == 16 and value[8] == 'T':
+        return f"{value[0:4]}-{value[4:6]}-{value[6:8]}T{value[9:11]}:{value[11:13]}:{value[13:15]}Z"
+    return value
+
+def build_filter(status=None, project=None, modified_after=None):
+    """Build the filter arguments that go before `export`.
+
+    status may be a single status or a list of them, which are OR-ed together.
+    """
+    args = []
+    if status:
+        statuses = [status] if isinstance(status, str) else list(status)
+        if len(statuses) == 1:
+            args.append(f'status:{statuses[0]}')
+        else:
+            args.append('(')
+            for i, value in enumerate(statuses):
+                if i:
+                    args.append('or')
+                args.append(f'status:{value}')
+            args.append(')')
+    if project:
+        args.append(f'project:{project}')
+    if modified_after:
+        args.append(f'modified.after:{format_date(modified_after)}')
+    return args
+
+def backend():
+    return os.getenv('TASKWARRIOR_BACKEND', DEFAULT_BACKEND)
+
+def matches(task, status=None, project=None, modified_after=None):
+    """Apply the same filter build_filter() hands to `task`, in Python."""
+    if status:
+        statuses = [status] if isinstance(status, str) else status
+        if task.get('status') not in statuses:
+            return False
+    if project:
+        task_project = task.get('project', '')
+        if task_project != project and not task_project.startswith(project + '.'):
+            return False
+    if modified_after and not task.get('modified', '') > modified_after:
+        return False
+    return True
+
+def export_tasks(status=None, project=None, modified_after=None):
+    """Return the tasks matching the filter. Raises TaskwarriorError on failure."""
+    return export_task_sets([{'status': status, 'project': project, 'modified_after': modified_after}])[0]
+
+def export_task_sets(filters):
+    """Return one task list per filter, each a dict of export_tasks() keyword arguments.
+
+    The direct backend answers every filter from a single read of the data
+    store; the CLI backend runs one `task export` per filter.
+    """
+    if backend() == 'direct':
+        return export_task_sets_direct(filters)
+    return [export_tasks_cli(**task_filter) for task_filter in filters]
+
+def export_task_sets_direct(filters):
+    import sqlite3
+    import taskwarrior_store
+
+    task_sets = [[] for _ in filters]
+    try:
+        for task in taskwarrior_store.read_tasks():
+            for task_set, task_filter in zip(task_sets, filters):
+                if matches(task, **task_filter):
+                    task_set.append(task)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        raise TaskwarriorError(f"Error reading the Taskwarrior data store: {e}") from e
+    return task_sets
+
+def export_tasks_cli(status=None, project=None, modified_after=None):
+    """Run `task <filter> export` and return the parsed tasks."""
+    command = ['task', 'rc.verbose=nothing', 'rc.json.array=on']
+    command += build_filter(status, project, modified_after)
+    command.append('export')
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, check=True)
+        return json.loads(result.stdout or '[]')
+    except (OSError, subprocess.CalledProcessError, ValueError) as e:
+        raise TaskwarriorError(f"Error loading tasks from Taskwarrior: {e}") from e
+
+def newest_modified(tasks, watermark=None):
+    """Return the highest 'modified' timestamp among tasks and the current watermark."""
+    for task in tasks:
+        modified = task.get('modified')
+        if modified and (watermark is None or modified > watermark):
+            watermark = modified
+    return watermark
+
+def load_watermark(path):
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f).get('modified')
+    return None
+
+def save_watermark(path, watermark):
+    if not watermark:
+        return
+    with open(path, 'w') as f:
+        json.dump({'modified': watermark}, f)
@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+
+import json
+import os
+import re
+import time
+
+DATE_FIELDS = frozenset(('entry', 'modified', 'end', 'due', 'wait', 'scheduled', 'until', 'start'))
+# `task export` prints these as JSON numbers rather than strings
+NUMERIC_FIELDS = frozenset(('imask',))
+# Tasks in these states keep their working set / pending.data id in `task export`
+OPEN_STATUSES = ('pending', 'waiting', 'recurring')
+
+FF4_ATTRIBUTE_RE = re.compile(r'([^\s:\[\]]+):"((?:[^"\\]|\\.)*)"')
+FF4_ENTITIES = (('&open;', '['), ('&close;', ']'), ('&dquot;', '"'))
+
+def read_taskrc():
+    """Return the key=value settings of the taskrc `task` would use (TASKRC, else ~/.taskrc)."""
+    settings = {}
+    taskrc = os.path.expanduser(os.getenv('TASKRC') or '~/.taskrc')
+    if os.path.exists(taskrc):
+        with open(taskrc, 'r') as f:
+            for line in f:
+                key, _, value = line.partition('#')[0].partition('=')
+                if key.strip() and value.strip():
+                    settings[key.strip()] = value.strip()
+    return settings
+
+def data_location(taskrc=None):
+    """Find the Taskwarrior data directory the same way `task` does: TASKDATA, then data.location in TASKRC."""
+    if os.getenv('TASKDATA'):
+        return os.path.expanduser(os.getenv('TASKDATA'))
+    taskrc = read_taskrc() if taskrc is None else taskrc
+    return os.path.expanduser(taskrc.get('data.location', '~/.task'))
+
+def field_types(taskrc=None):
+    """Return (date fields, numeric fields): the built-in ones plus the UDAs declared in the taskrc."""
+    taskrc = read_taskrc() if taskrc is None else taskrc
+    date_fields = set(DATE_FIELDS)
+    numeric_fields = set(NUMERIC_FIELDS)
+    for key, value in taskrc.items():
+        if key.startswith('uda.') and key.endswith('.type'):
+            name = key[len('uda.'):-len('.type')]
+            if value == 'date':
+                date_fields.add(name)
+            elif value == 'numeric':
+                numeric_fields.add(name)
+    return frozenset(date_fields), frozenset(numeric_fields)
+
+def format_timestamp(value):
+    """Epoch seconds, as stored on disk, to the 20240101T100000Z form `task export` prints."""
+    try:
+        return time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(int(value)))
+    except (TypeError, ValueError):
+        return value
+
+def format_number(value):
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+def to_export_record(uuid, attributes, task_id, date_fields=DATE_FIELDS, numeric_fields=NUMERIC_FIELDS):
+    """Shape raw stored attributes like a `task export` record. Urgency is not computed."""
+    record = {'id': task_id if attributes.get('status') in OPEN_STATUSES else 0}
+    tags = []
+    depends = []
+    annotations = []
+
+    for key, value in attributes.items():
+        if key in date_fields:
+            record[key] = format_timestamp(value)
+        elif key in numeric_fields:
+            record[key] = format_number(value)
+        elif '_' not in key and key != 'tags' and key != 'depends':
+            record[key] = value
+        elif key.startswith('tag_'):
+            tags.append(key[len('tag_'):])
+        elif key == 'tags':
+            tags.extend(tag for tag in value.split(',') if tag)
+        elif key.startswith('dep_'):
+            depends.append(key[len('dep_'):])
+        elif key == 'depends':
+            depends.extend(dep for dep in value.split(',') if dep)
+        elif key.startswith('annotation_'):
+            entry = key[len('annotation_'):]
+            annotations.append((int(entry) if entry.isdigit() else 0, {'entry': format_timestamp(entry), 'description': value}))
+        else:
+            record[key] = value
+
+    record['uuid'] = uuid
+    if tags:
+        record['tags'] = tags
+    if depends:
+        record['depends'] = depends
+    if annotations:
+        if len(annotations) > 1:
+            annotations.sort(key=lambda item: item[0])
+        record['annotations'] = [annotation for _, annotation in annotations]
+    return record
+
+def decode_ff4_value(value):
+    if '\\' in value:
+        value = json.loads(f'"{value}"')
+    if '&' in value:
+        for entity, char in FF4_ENTITIES:
+            value = value.replace(entity, char)
+    return value
+
+def parse_ff4_line(line):
+    return {key: decode_ff4_value(value) for key, value in FF4_ATTRIBUTE_RE.findall(line)}
+
+def read_legacy(data_dir, date_fields=DATE_FIELDS, numeric_fields=NUMERIC_FIELDS):
+    """Yield export records from Taskwarrior 2.x pending.data and completed.data."""
+    for filename, numbered in (('pending.data', True), ('completed.data', False)):
+        path = os.path.join(data_dir, filename)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            line_number = 0
+            for line in f:
+                line = line.strip()
+                if not line.startswith('['):
+                    continue
+                line_number += 1
+                attributes = parse_ff4_line(line)
+                uuid = attributes.pop('uuid', '')
+                yield to_export_record(uuid, attributes, line_number if numbered else 0, date_fields, numeric_fields)
+
+def read_taskchampion(path, date_fields=DATE_FIELDS, numeric_fields=NUMERIC_FIELDS):
+    """Yield export records from a Taskwarrior 3 TaskChampion SQLite replica, opened read-only."""
+    import sqlite3
+
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        working_set = {uuid: task_id for task_id, uuid in conn.execute('SELECT id, uuid FROM working_set') if uuid}
+        for uuid, data in conn.execute('SELECT uuid, data FROM tasks'):
+            yield to_export_record(uuid, json.loads(data), working_set.get(uuid, 0), date_fields, numeric_fields)
+    finally:
+        conn.close()
+
+def read_tasks(data_dir=None):
+    """Yield every task in the data store, preferring the TaskChampion replica when present.
+
+    UDA types come from the taskrc, so numeric and date UDAs are printed the
+    way `task export` prints them.
+    """
+    taskrc = read_taskrc()
+    data_dir = data_dir or data_location(taskrc)
+    date_fields, numeric_fields = field_types(taskrc)
+    replica = os.path.join(data_dir, 'taskchampion.sqlite3')
+    if os.path.exists(replica):
+        return read_taskchampion(replica, date_fields, numeric_fields)
+    return read_legacy(data_dir, date_fields, numeric_fields)
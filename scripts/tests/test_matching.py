@@ -0,0 +1,28 @@
+import pytest
+
+from matching import MatchIndex, normalize
+
+@pytest.mark.parametrize('line, key', [
+    ('x 2024-01-02 (A) 2024-01-01 Pay rent +home @desk due:2024-02-01', 'pay rent'),
+    ('x (B) Pay rent', 'pay rent'),
+    ('  PAY   rent  t:2024-01-01 rec:1m ', 'pay rent'),
+    ('x ray results', 'x ray results'),
+    ('Reply re:invoice', 'reply re:invoice'),
+    ('See https://example.com', 'see https://example.com'),
+    ('@home', '@home'),
+    ('due:friday', 'due:friday'),
+    ('', ''),
+])
+def test_normalize(line, key):
+    assert normalize(line) == key
+
+def test_distinct_key_value_descriptions_are_not_merged():
+    index = MatchIndex()
+    index.add('Reply re:invoice')
+    assert 'Reply re:contract' not in index
+
+def test_decoration_only_descriptions_are_indexed():
+    index = MatchIndex()
+    index.add('@home')
+    assert '@home' in index
+    assert 'due:friday' not in index
@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+import settings
+
+EXAMPLE_PROFILES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'profiles.example.json')
+
+@pytest.fixture
+def fresh_worker(monkeypatch):
+    """A pool worker that has not applied a profile yet, with both accounts' tokens in its environment."""
+    monkeypatch.setattr(settings, '_env_loaded', True)
+    monkeypatch.setattr(settings, '_original_environ', None)
+    monkeypatch.setenv('TODOIST_API_TOKEN', 'personal-token')
+    monkeypatch.setenv('TODOIST_TEAM_API_TOKEN', 'team-token')
+    for var in ('TASKDATA', 'TASKRC', 'TODOIST_METADATA_CACHE', 'TASKWARRIOR_BACKEND'):
+        monkeypatch.delenv(var, raising=False)
+
+def test_reused_worker_keeps_each_profiles_token(fresh_worker):
+    personal, team = settings.load_profiles(EXAMPLE_PROFILES)
+
+    settings.apply_profile(team)
+    assert os.environ['TODOIST_API_TOKEN'] == 'team-token'
+    settings.apply_profile(personal)
+    assert os.environ['TODOIST_API_TOKEN'] == 'personal-token'
+    assert 'TASKDATA' not in os.environ
+
+def test_profile_without_token_does_not_inherit_one(fresh_worker):
+    _, team = settings.load_profiles(EXAMPLE_PROFILES)
+    orphan = dict(team, todoist_token_env='TODOIST_MISSING_TOKEN')
+
+    settings.apply_profile(team)
+    settings.apply_profile(orphan)
+    assert 'TODOIST_API_TOKEN' not in os.environ
+
+def test_profiles_may_not_share_a_todo_file(tmp_path):
+    profiles_file = tmp_path / 'profiles.json'
+    profiles_file.write_text('{"profiles": [{"name": "a", "todo_file": "todo.txt"}, {"name": "b", "todo_file": "./todo.txt"}]}')
+    with pytest.raises(ValueError, match='share the same todo file'):
+        settings.load_profiles(str(profiles_file))
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+import sync_all_three
+import taskwarrior
+
+class FakeTaskwarrior:
+    """Stands in for `task`: export by status, and `done` fails unless the task is open, like the real CLI."""
+
+    def __init__(self, tasks):
+        self.tasks = {task['uuid']: dict(task) for task in tasks}
+
+    def export_task_sets(self, filters):
+        return [[dict(task) for task in self.tasks.values() if taskwarrior.matches(task, **task_filter)]
+                for task_filter in filters]
+
+    def mark_done(self, description, task_uuid=None):
+        task = self.tasks.get(task_uuid)
+        if task is None or task['status'] not in ('pending', 'waiting'):
+            return False
+        task.update(status='completed', modified='20240105T100000Z')
+        return True
+
+@pytest.fixture
+def sync_env(tmp_path, monkeypatch):
+    todo_file = tmp_path / 'todo.txt'
+    todo_file.write_text('x 2024-01-02 Water the plants\n(A) Buy milk\nCall the client\n')
+    fake = FakeTaskwarrior([
+        {'uuid': 'aaaaaaaa-0000-4000-8000-000000000001', 'description': 'Buy milk', 'status': 'pending', 'modified': '20240101T100000Z'},
+        {'uuid': 'aaaaaaaa-0000-4000-8000-000000000002', 'description': 'File taxes', 'status': 'completed', 'modified': '20240102T100000Z'},
+        {'uuid': 'aaaaaaaa-0000-4000-8000-000000000003', 'description': 'Call the client', 'status': 'pending', 'modified': '20240101T100000Z'},
+    ])
+
+    def load_done_from_todoist(cursor):
+        cursor.update(complete=True, watermark='2024-01-03T10:00:00Z')
+        return [{'id': '1', 'content': 'Buy milk'}]
+
+    monkeypatch.setattr(taskwarrior, 'export_task_sets', fake.export_task_sets)
+    monkeypatch.setattr(sync_all_three, 'mark_done_in_taskwarrior', fake.mark_done)
+    monkeypatch.setattr(sync_all_three, 'load_done_from_todoist', load_done_from_todoist)
+    monkeypatch.setattr(sync_all_three, 'load_from_todoist', lambda: [])
+    return str(todo_file), str(tmp_path / 'state.json'), fake
+
+def test_second_sync_commits(sync_env):
+    todo_file, state_file, fake = sync_env
+
+    first = sync_all_three.sync_tasks(todo_file, state_file)
+    second = sync_all_three.sync_tasks(todo_file, state_file)
+
+    for summary in (first, second):
+        assert 'retrying' not in summary and 'abandoned' not in summary
+    assert os.path.exists(state_file)
+    assert os.path.exists(sync_all_three.todoist_cursor_path(state_file))
+    assert taskwarrior.load_watermark(sync_all_three.taskwarrior_watermark_path(state_file)) == '20240105T100000Z'
+    # Only the task still open in Taskwarrior was marked done there
+    assert fake.tasks['aaaaaaaa-0000-4000-8000-000000000001']['status'] == 'completed'
+    assert fake.tasks['aaaaaaaa-0000-4000-8000-000000000003']['status'] == 'pending'
+
+def test_taskwarrior_done_is_only_planned_for_open_tasks(sync_env, monkeypatch):
+    todo_file, state_file, _ = sync_env
+    planned = []
+    plan_operations = sync_all_three.plan_operations
+    monkeypatch.setattr(sync_all_three, 'plan_operations', lambda *args: planned.extend(plan_operations(*args)) or planned)
+
+    sync_all_three.sync_tasks(todo_file, state_file)
+    assert [key for kind, key, _ in planned if kind == 'taskwarrior_done'] == ['taskwarrior_done:aaaaaaaa-0000-4000-8000-000000000001']
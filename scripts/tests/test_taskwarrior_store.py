@@ -0,0 +1,86 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+import taskwarrior
+import taskwarrior_store
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'taskwarrior')
+LEGACY_DIR = os.path.join(FIXTURES, 'legacy')
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'r') as f:
+        return json.load(f)
+
+def expected_export():
+    """The fixture store as `task export` prints it, minus urgency, which the direct backend does not compute."""
+    return [{key: value for key, value in record.items() if key != 'urgency'} for record in load_fixture('export.json')]
+
+@pytest.fixture(autouse=True)
+def fixture_taskrc(monkeypatch):
+    monkeypatch.setenv('TASKRC', os.path.join(FIXTURES, 'taskrc'))
+    monkeypatch.delenv('TASKDATA', raising=False)
+
+@pytest.fixture
+def champion_dir(tmp_path):
+    fixture = load_fixture('taskchampion.json')
+    conn = sqlite3.connect(tmp_path / 'taskchampion.sqlite3')
+    conn.execute('CREATE TABLE tasks (uuid STRING PRIMARY KEY, data STRING)')
+    conn.execute('CREATE TABLE working_set (id INTEGER PRIMARY KEY, uuid STRING)')
+    conn.executemany('INSERT INTO tasks VALUES (?, ?)', [(uuid, json.dumps(data)) for uuid, data in fixture['tasks'].items()])
+    conn.executemany('INSERT INTO working_set VALUES (?, ?)', fixture['working_set'])
+    conn.commit()
+    conn.close()
+    return str(tmp_path)
+
+def by_uuid(records):
+    return {record['uuid']: record for record in records}
+
+def test_legacy_store_matches_task_export():
+    assert list(taskwarrior_store.read_tasks(LEGACY_DIR)) == expected_export()
+
+def test_taskchampion_store_matches_task_export(champion_dir):
+    assert by_uuid(taskwarrior_store.read_tasks(champion_dir)) == by_uuid(expected_export())
+
+def test_completed_and_deleted_tasks_in_pending_data_have_no_id():
+    records = by_uuid(taskwarrior_store.read_tasks(LEGACY_DIR))
+    assert records['aaaaaaaa-0000-4000-8000-000000000003']['id'] == 0
+    assert records['aaaaaaaa-0000-4000-8000-000000000005']['id'] == 0
+    # Later lines keep their line number until `task` garbage collects
+    assert records['aaaaaaaa-0000-4000-8000-000000000008']['id'] == 8
+
+def test_uda_types_come_from_taskrc(monkeypatch):
+    monkeypatch.setenv('TASKRC', os.devnull)
+    record = by_uuid(taskwarrior_store.read_tasks(LEGACY_DIR))['aaaaaaaa-0000-4000-8000-000000000001']
+    assert record['estimate'] == '3'
+
+def test_direct_backend_filters_like_task(monkeypatch):
+    monkeypatch.setenv('TASKDATA', LEGACY_DIR)
+    monkeypatch.setenv('TASKWARRIOR_BACKEND', 'direct')
+
+    open_tasks, completed = taskwarrior.export_task_sets([
+        {'status': ['pending', 'waiting']},
+        {'status': 'completed', 'modified_after': '20240102T100000Z'},
+    ])
+    assert [task['id'] for task in open_tasks] == [1, 2, 4, 7, 8]
+    assert [task['description'] for task in completed] == ['Buy milk', 'File taxes']
+    assert [task['description'] for task in taskwarrior.export_tasks(project='work')] == ['Write the Q1 report', 'Call the client']
+
+def test_direct_backend_reads_the_store_once(monkeypatch):
+    monkeypatch.setenv('TASKDATA', LEGACY_DIR)
+    monkeypatch.setenv('TASKWARRIOR_BACKEND', 'direct')
+    reads = []
+    read_tasks = taskwarrior_store.read_tasks
+    monkeypatch.setattr(taskwarrior_store, 'read_tasks', lambda *args: reads.append(args) or read_tasks(*args))
+
+    taskwarrior.export_task_sets([{'status': ['pending', 'waiting']}, {'status': 'completed'}])
+    assert len(reads) == 1
+
+def test_unreadable_store_raises(monkeypatch, tmp_path):
+    (tmp_path / 'taskchampion.sqlite3').write_text('not a database')
+    monkeypatch.setenv('TASKDATA', str(tmp_path))
+    monkeypatch.setenv('TASKWARRIOR_BACKEND', 'direct')
+    with pytest.raises(taskwarrior.TaskwarriorError):
+        taskwarrior.export_tasks()
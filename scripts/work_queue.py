@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+
+import json
+import sqlite3
+import time
+
+def open_queue(path):
+    """Open (and create) the SQLite work queue. WAL plus synchronous=FULL so a checkpoint survives a crash."""
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=FULL')
+    conn.execute('''CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at REAL NOT NULL,
+        finished_at REAL,
+        state TEXT NOT NULL)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS operations (
+        run_id INTEGER NOT NULL REFERENCES runs(id),
+        seq INTEGER NOT NULL,
+        key TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        finished_at REAL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (run_id, key))''')
+    # Queues created before attempts were counted
+    if 'attempts' not in {row[1] for row in conn.execute('PRAGMA table_info(operations)')}:
+        conn.execute('ALTER TABLE operations ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0')
+    conn.commit()
+    return conn
+
+def start_run(conn, operations, state):
+    """Record a planned run and its (kind, key, payload) operations in one transaction.
+
+    The key is the operation's idempotency key: planning the same key twice in
+    a run keeps only the first, so a replay can never apply it twice.
+    """
+    with conn:
+        cursor = conn.execute('INSERT INTO runs (created_at, state) VALUES (?, ?)', (time.time(), json.dumps(state)))
+        run_id = cursor.lastrowid
+        conn.executemany('INSERT OR IGNORE INTO operations (run_id, seq, key, kind, payload) VALUES (?, ?, ?, ?, ?)',
+                         [(run_id, seq, key, kind, json.dumps(payload)) for seq, (kind, key, payload) in enumerate(operations)])
+    return run_id
+
+def unfinished_run(conn):
+    """Return (run_id, state) of the oldest run that never finished, or None."""
+    row = conn.execute('SELECT id, state FROM runs WHERE finished_at IS NULL ORDER BY id LIMIT 1').fetchone()
+    if row is None:
+        return None
+    return row[0], json.loads(row[1])
+
+def pending_operations(conn, run_id):
+    """Yield (key, kind, payload) for the run's operations that have not succeeded yet, in plan order."""
+    rows = conn.execute("SELECT key, kind, payload FROM operations WHERE run_id = ? AND status = 'pending' ORDER BY seq",
+                        (run_id,)).fetchall()
+    for key, kind, payload in rows:
+        yield key, kind, json.loads(payload)
+
+def checkpoint(conn, run_id, key, status='done'):
+    with conn:
+        conn.execute('UPDATE operations SET status = ?, finished_at = ? WHERE run_id = ? AND key = ?',
+                     (status, time.time(), run_id, key))
+
+def record_failure(conn, run_id, key):
+    """Count a failed attempt at an operation, which stays pending, and return its attempts so far."""
+    with conn:
+        conn.execute('UPDATE operations SET attempts = attempts + 1 WHERE run_id = ? AND key = ?', (run_id, key))
+        return conn.execute('SELECT attempts FROM operations WHERE run_id = ? AND key = ?', (run_id, key)).fetchone()[0]
+
+def finish_run(conn, run_id):
+    """Mark the run finished (or abandoned) and drop its operations, keeping the queue file small."""
+    with conn:
+        conn.execute("UPDATE runs SET finished_at = ?, state = '{}' WHERE id = ?", (time.time(), run_id))
+        conn.execute('DELETE FROM operations WHERE run_id = ?', (run_id,))